@@ -4,30 +4,290 @@ This module contains functions for handling user and post management in the appl
 Functions provided:
 - `create_user`: Creates a new user and adds it to the database.
 - `get_user_by_email`: Retrieves a user by their email.
+- `hash_needs_upgrade`: Checks whether a stored password hash uses outdated Argon2 parameters.
+- `update_user_password_hash`: Replaces the stored password hash of a user, e.g. after a parameter change.
 - `create_post`: Creates a new post for a user and stores it in the database.
 - `get_all_posts_by_user_id`: Retrieves all posts made by a user, using caching for performance.
 - `delete_post_by_post_id`: Deletes a post from the database by its post ID.
+
+The Argon2id parameters follow the OWASP / RFC 9106 guidance (t=1, at least 46 MiB of memory). `memory_cost` is
+calibrated once per host to take roughly `ARGON2_TARGET_SECONDS` per hash and the result is cached on disk, so
+subsequent process starts do not repeat the calibration. Concurrently starting workers serialize on a lock file, so
+only the first one calibrates and the others read its result.
+
+The queries on the request path are built with `lambda_stmt`, so SQLAlchemy caches each statement by the
+lambda's code object and only binds the new parameter values on subsequent calls.
+
+`users_cache` keeps recently looked-up users by email for a short time, so repeated logins and token checks for
+the same user skip the database. Only found users are cached, so a fresh signup is visible to every worker at once.
+
+`posts_cache` is bounded by the approximate memory of the cached posts (`POSTS_CACHE_MAX_BYTES`) rather than by
+the number of users. Whenever a post of a user is created or deleted, their entry is dropped and they get a new
+generation in `posts_cache_generations`; a reader only stores its query result if the generation did not change
+while the query was running, so results read before a write are never cached after it. Generations expire after a
+few minutes, so the map of them stays bounded as well. The cache is per process, so with
+several workers another worker may serve its own cached entry until the TTL expires.
 """
 
-from argon2 import PasswordHasher
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Import Error will occur on platforms without POSIX file locks, e.g. Windows
+    fcntl = None
+
+from argon2 import PasswordHasher, Type, extract_parameters
 from cachetools import TTLCache
+from sqlalchemy import Row, delete, insert, lambda_stmt, select, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import SessionLocal
 from models import Posts, Users
-from schemas import PostCreate, UserSchema
+from schemas import AuthenticatedUser, PostCreate, UserSchema
+
+ARGON2_TIME_COST = 1
+# Hashes run one per process in `utilities.HASH_EXECUTOR`, which is sized to the CPU count, so requests are
+# parallelized across processes. Lanes inside a single hash would only compete with the other workers for the
+# same cores, hence p=1.
+ARGON2_PARALLELISM = 1
+ARGON2_HASH_LEN = 32
+ARGON2_SALT_LEN = 16
+ARGON2_MIN_MEMORY_COST = 46 * 1024  # KiB, OWASP minimum for t=1
+ARGON2_MAX_MEMORY_COST = 256 * 1024  # KiB, upper bound for the calibration
+ARGON2_TARGET_SECONDS = 0.05
+ARGON2_COSTS_FILE = os.environ.get(
+    "ARGON2_COSTS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "argon2_costs.json"),
+)
+
+
+def _build_hasher(memory_cost: int) -> PasswordHasher:
+    """
+    Build an Argon2id password hasher with the application's parameters and the given memory cost.
+
+    Args:
+        memory_cost (int): The amount of memory used by a single hash, in KiB.
 
-ph = PasswordHasher()
-posts_cache = TTLCache(maxsize=1000, ttl=300)
+    Returns:
+        PasswordHasher: The configured password hasher.
+    """
+    return PasswordHasher(
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=memory_cost,
+        parallelism=ARGON2_PARALLELISM,
+        hash_len=ARGON2_HASH_LEN,
+        salt_len=ARGON2_SALT_LEN,
+        type=Type.ID,
+    )
+
+
+def _calibrate_memory_cost() -> int:
+    """
+    Find the largest memory cost (in MiB steps) whose hash time stays within `ARGON2_TARGET_SECONDS` on this host.
+
+    Returns:
+        int: The calibrated memory cost in KiB, never lower than `ARGON2_MIN_MEMORY_COST`.
+
+    The search is a binary search between `ARGON2_MIN_MEMORY_COST` and `ARGON2_MAX_MEMORY_COST`. If the minimum
+    already exceeds the target time, the minimum is used, so the calibration can only make hashing stronger.
+    """
+    low, high = ARGON2_MIN_MEMORY_COST // 1024, ARGON2_MAX_MEMORY_COST // 1024
+    best = low
+    while low <= high:
+        middle = (low + high) // 2
+        hasher = _build_hasher(middle * 1024)
+        start = time.perf_counter()
+        hasher.hash("calibration")
+        if time.perf_counter() - start <= ARGON2_TARGET_SECONDS:
+            best, low = middle, middle + 1
+        else:
+            high = middle - 1
+    return best * 1024
 
 
-def create_user(db: SessionLocal, user: UserSchema) -> None:
+def _read_memory_cost() -> Optional[int]:
+    """
+    Read the calibrated Argon2 memory cost from `ARGON2_COSTS_FILE`.
+
+    Returns:
+        int: The memory cost in KiB, or None if the file is missing, unreadable or was calibrated with a different
+        time cost or parallelism.
+    """
+    try:
+        with open(ARGON2_COSTS_FILE) as costs_file:
+            costs = json.load(costs_file)
+        if (
+            costs["time_cost"] == ARGON2_TIME_COST
+            and costs["parallelism"] == ARGON2_PARALLELISM
+            and ARGON2_MIN_MEMORY_COST <= costs["memory_cost"] <= ARGON2_MAX_MEMORY_COST
+        ):
+            return costs["memory_cost"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_memory_cost(memory_cost: int) -> None:
+    """
+    Atomically write the calibrated Argon2 memory cost to `ARGON2_COSTS_FILE`.
+
+    Args:
+        memory_cost (int): The memory cost in KiB.
+
+    The costs are written to a temporary file in the same directory which then replaces `ARGON2_COSTS_FILE`, so a
+    concurrent reader sees either the old file or the complete new one, never a truncated file.
+    """
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(ARGON2_COSTS_FILE) or ".")
+    except OSError:
+        # A read-only filesystem only means the calibration is repeated on the next start
+        return
+    try:
+        with os.fdopen(fd, "w") as costs_file:
+            json.dump(
+                {
+                    "time_cost": ARGON2_TIME_COST,
+                    "parallelism": ARGON2_PARALLELISM,
+                    "memory_cost": memory_cost,
+                },
+                costs_file,
+            )
+        os.replace(temp_path, ARGON2_COSTS_FILE)
+    except OSError:
+        os.unlink(temp_path)
+
+
+@contextmanager
+def _calibration_lock():
+    """
+    Hold an exclusive lock on `ARGON2_COSTS_FILE` + ".lock" for the duration of the `with` block.
+
+    Without POSIX file locks, or if the lock file can't be created, the block runs unlocked.
+    """
+    try:
+        lock_file = open(ARGON2_COSTS_FILE + ".lock", "a")
+    except OSError:
+        lock_file = None
+    try:
+        if fcntl is not None and lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+
+def _load_memory_cost() -> int:
+    """
+    Return the calibrated Argon2 memory cost, reading it from `ARGON2_COSTS_FILE` when possible.
+
+    Returns:
+        int: The memory cost in KiB.
+
+    If there is no usable cached value, the calibration runs under `_calibration_lock` and its result is written
+    back to the file. The file is read again once the lock is held, so workers that were waiting for another worker's
+    calibration reuse its result instead of calibrating concurrently and picking different costs.
+    """
+    if (memory_cost := _read_memory_cost()) is not None:
+        return memory_cost
+
+    with _calibration_lock():
+        if (memory_cost := _read_memory_cost()) is not None:
+            return memory_cost
+        memory_cost = _calibrate_memory_cost()
+        _write_memory_cost(memory_cost)
+    return memory_cost
+
+
+ph = _build_hasher(_load_memory_cost())
+# Verified instead of a real hash when a login email is unknown, so that response time doesn't reveal whether
+# the user exists
+DUMMY_HASH = ph.hash("x" * 16)
+
+
+def hash_needs_upgrade(hashed_password: str) -> bool:
+    """
+    Check whether a stored password hash was created with outdated Argon2 parameters.
+
+    Args:
+        hashed_password (str): The stored Argon2 hash.
+
+    Returns:
+        bool: True if the hash is not Argon2id, uses a different time cost or parallelism, or uses less memory than
+        `ARGON2_MIN_MEMORY_COST`.
+
+    Unlike `ph.check_needs_rehash`, a different `memory_cost` above the floor is accepted: it is calibrated per host,
+    so requiring an exact match would make hosts re-hash each other's hashes back and forth on every login.
+    """
+    parameters = extract_parameters(hashed_password)
+    return (
+        parameters.type is not Type.ID
+        or parameters.time_cost != ARGON2_TIME_COST
+        or parameters.parallelism != ARGON2_PARALLELISM
+        or parameters.memory_cost < ARGON2_MIN_MEMORY_COST
+    )
+
+
+POSTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Approximate bytes per cached post besides its text: the dict, its slot in the list and the `post_id` int
+POSTS_CACHE_POST_OVERHEAD = 256
+
+
+def _posts_size(posts: list[dict]) -> int:
+    """
+    Approximate the memory used by a cached list of posts in bytes, used as `getsizeof` for `posts_cache`.
+
+    Args:
+        posts (list[dict]): The cached posts of a single user.
+
+    Returns:
+        int: The size of the list plus, for every post, `POSTS_CACHE_POST_OVERHEAD` and the size of its text.
+    """
+    return sys.getsizeof(posts) + sum(
+        POSTS_CACHE_POST_OVERHEAD + sys.getsizeof(post["text"]) for post in posts
+    )
+
+
+posts_cache = TTLCache(maxsize=POSTS_CACHE_MAX_BYTES, ttl=300, getsizeof=_posts_size)
+# Only has to outlive the reads in flight when a post is written, so it expires long after `posts_cache`
+posts_cache_generations = TTLCache(maxsize=65536, ttl=600)
+_posts_cache_generation_counter = itertools.count(1)
+posts_cache_lock = threading.Lock()
+users_cache = TTLCache(maxsize=1024, ttl=30)
+users_cache_lock = threading.Lock()
+
+
+def _invalidate_posts_cache(user_id: int) -> None:
+    """
+    Drop the cached posts of a user and give them a new generation, so that reads already in flight are not cached.
+
+    Generations are drawn from one counter shared by all users, so a user whose generation expired never gets a
+    value back that a read in flight might still hold.
+
+    Args:
+        user_id (int): The ID of the user whose posts changed.
+    """
+    with posts_cache_lock:
+        posts_cache_generations[user_id] = next(_posts_cache_generation_counter)
+        posts_cache.pop(user_id, None)
+
+
+async def create_user(db: AsyncSession, user: UserSchema, hashed_password: str) -> None:
     """
     Create a new user in the database.
 
     Args:
-        db (SessionLocal): The database session used to commit the transaction.
+        db (AsyncSession): The database session used to commit the transaction.
         user (UserSchema): The user schema containing the email and password data.
+        hashed_password (str): The Argon2 hash of the user's password, computed by the caller with `ph.hash`.
 
     Returns:
         None: The function does not return a value, but commits the user creation to the database.
@@ -35,87 +295,153 @@ def create_user(db: SessionLocal, user: UserSchema) -> None:
     Raises:
         IntegrityError: If a user with the same email already exists in the database, an exception is raised.
     """
-    new_user = Users(email=user.email, hashed_password=ph.hash(user.hashed_password))
-    db.add(new_user)
     try:
-        db.commit()
+        await db.execute(
+            insert(Users).values(email=user.email, hashed_password=hashed_password)
+        )
+        await db.commit()
     except IntegrityError:  # Integrity Error will occur when given email is already in the database
-        db.rollback()
+        await db.rollback()
         raise
-    db.refresh(new_user)
 
 
-def get_user_by_email(db: SessionLocal, email: str) -> Users:
+async def update_user_password_hash(
+    db: AsyncSession, email: str, hashed_password: str
+) -> None:
     """
-    Retrieve a user from the database using their email.
+    Replace the stored password hash of a user.
 
     Args:
-        db (SessionLocal): The database session used to query the database.
+        db (AsyncSession): The database session used to commit the transaction.
+        email (str): The email address of the user whose hash is replaced.
+        hashed_password (str): The new Argon2 hash of the user's password, computed by the caller with `ph.hash`.
+
+    Returns:
+        None: The function does not return a value, but commits the update to the database.
+
+    This is used to migrate hashes created with older Argon2 parameters to the current ones. The user's cached row
+    is dropped, since it contains the old hash.
+    """
+    await db.execute(
+        update(Users)
+        .where(Users.email == email)
+        .values(hashed_password=hashed_password)
+    )
+    await db.commit()
+    with users_cache_lock:
+        users_cache.pop(email, None)
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[Row]:
+    """
+    Retrieve a user from the database using their email, using cache to improve performance.
+
+    Args:
+        db (AsyncSession): The database session used to query the database.
         email (str): The email address of the user to be retrieved.
 
     Returns:
-        Users: The user object if found, or None if no user with the given email exists.
+        Row: A row with the `id`, `email` and `hashed_password` of the user if found, or None if no user with the
+        given email exists.
+
+    This function checks if the user is cached. If not, it queries only the needed columns, so no `Users` object is
+    built, and caches the row if the user exists.
     """
-    return db.query(Users).filter_by(email=email).first()
+    with users_cache_lock:
+        if email in users_cache:
+            return users_cache[email]
+    stmt = lambda_stmt(
+        lambda: select(Users.id, Users.email, Users.hashed_password).where(
+            Users.email == email
+        )
+    )
+    user = (await db.execute(stmt)).first()
+    if user is not None:
+        with users_cache_lock:
+            users_cache[email] = user
+
+    return user
 
 
-def create_post(db: SessionLocal, post: PostCreate, user: Users) -> int:
+async def create_post(
+    db: AsyncSession, post: PostCreate, user: AuthenticatedUser
+) -> int:
     """
     Create a new post in the database associated with a specific user.
 
     Args:
-        db (SessionLocal): The database session used to commit the transaction.
+        db (AsyncSession): The database session used to commit the transaction.
         post (PostCreate): The post data to be created, containing the post text.
-        user (Users): The user object representing the user creating the post.
+        user (AuthenticatedUser): The authenticated user creating the post.
 
     Returns:
         int: The ID of the newly created post.
 
-    This function commits the new post to the database and returns its unique post ID.
+    This function commits the new post to the database, drops the user's cached posts and returns its unique post ID.
+    The row is inserted with a plain INSERT statement, so no ORM object is created and the generated ID is taken
+    from the cursor instead of being reloaded with a second query.
     """
-    new_post = Posts(text=post.text, user_id=user.id)
-    db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
-    return new_post.post_id
+    result = await db.execute(insert(Posts).values(text=post.text, user_id=user.id))
+    await db.commit()
+    _invalidate_posts_cache(user.id)
+    return result.inserted_primary_key[0]
 
 
-def get_all_posts_by_user_id(db: SessionLocal, user_id: int) -> Posts:
+async def get_all_posts_by_user_id(db: AsyncSession, user_id: int) -> list[dict]:
     """
     Retrieve all posts made by a specific user, using cache to improve performance.
 
     Args:
-        db (SessionLocal): The database session used to query the database.
+        db (AsyncSession): The database session used to query the database.
         user_id (int): The ID of the user whose posts are to be retrieved.
 
     Returns:
-        Posts: A list of posts made by the user.
+        list[dict]: A list of plain dicts with the `post_id` and `text` of each post made by the user.
 
-    This function checks if the user's posts are cached. If not, it queries the database and caches the result.
+    This function checks if the user's posts are cached. If not, it queries the database and caches the result,
+    unless the user's posts were created or deleted while the query was running. Only the needed columns are
+    selected, so no ORM objects are built and no relationship can be lazy-loaded while the response is
+    serialized. The rows are returned as plain dicts, which `orjson` serializes natively.
     """
-    if user_id in posts_cache:
-        return posts_cache[user_id]
-    posts = db.query(Posts).filter_by(user_id=user_id).all()
-    posts_cache[user_id] = posts
+    with posts_cache_lock:
+        if user_id in posts_cache:
+            return posts_cache[user_id]
+        generation = posts_cache_generations.get(user_id)
+    stmt = lambda_stmt(
+        lambda: select(Posts.post_id, Posts.text).where(Posts.user_id == user_id)
+    )
+    result = await db.execute(stmt)
+    posts = [{"post_id": post_id, "text": text} for post_id, text in result]
+    with posts_cache_lock:
+        if posts_cache_generations.get(user_id) == generation:
+            try:
+                posts_cache[user_id] = posts
+            except ValueError:  # Value Error will occur when the posts alone are larger than the whole cache
+                pass
 
     return posts
 
 
-def delete_post_by_post_id(db: SessionLocal, post_id: int) -> bool:
+async def delete_post_by_post_id(db: AsyncSession, post_id: int) -> bool:
     """
     Delete a post from the database by its post ID.
 
     Args:
-        db (SessionLocal): The database session used to commit the transaction.
+        db (AsyncSession): The database session used to commit the transaction.
         post_id (int): The ID of the post to be deleted.
 
     Returns:
         bool: Returns True if the post was successfully deleted, otherwise False.
 
-    If the post with the given ID exists, it will be deleted and the transaction committed.
+    The post is deleted with a single DELETE statement that returns the owner's ID, so the post is never loaded.
+    If a post was deleted, the transaction is committed and the owner's cached posts are dropped.
     """
-    if post := db.query(Posts).filter_by(post_id=post_id).first():
-        db.delete(post)
-        db.commit()
-        return True
-    return False
+    stmt = lambda_stmt(
+        lambda: delete(Posts).where(Posts.post_id == post_id).returning(Posts.user_id)
+    )
+    user_id = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    if user_id is None:
+        return False
+    _invalidate_posts_cache(user_id)
+    return True
@@ -1,33 +1,106 @@
 """
-This module sets up the database connection and session management for the application using SQLAlchemy.
+This module sets up the asynchronous database connection and session management for the application using
+SQLAlchemy's asyncio extension and the `aiosqlite` driver, so database I/O never blocks the event loop.
 
 It provides:
-- `engine`: The SQLAlchemy engine for connecting to the database.
-- `SessionLocal`: The session factory used to create database sessions.
+- `engine_ro`: The async SQLAlchemy engine for read-only connections, pooled with one connection per CPU core.
+- `engine_rw`: The async SQLAlchemy engine for writes, pooled with a single connection (SQLite allows one writer at a time).
+- `SessionLocalRO`: The async session factory bound to `engine_ro`, used by queries.
+- `SessionLocalRW`: The async session factory bound to `engine_rw`, used by inserts, deletes and schema creation.
 - `Base`: The base class for SQLAlchemy models, which is used for declarative class definitions.
 
 Configurations:
 - `DATABASE_URL`: The connection string for the database (SQLite in this case).
-- The `SessionLocal` factory will create sessions that do not autocommit or auto flush, giving more control over transactions.
+- `DATABASE_URL_RO`: The same database opened through an SQLite URI in read-only mode.
+- Both engines use an `AsyncAdaptedQueuePool` with `max_overflow=0`, so connections are opened once and reused across
+requests, and waiting for a free connection is scheduled on the event loop.
+- Every new connection is configured with `SQLITE_PRAGMAS` (`synchronous=NORMAL`, 64 MB page cache, in-memory temp
+storage, busy timeout and foreign keys). The read-write connection additionally switches the database to the WAL
+journal (a persistent setting that read-only connections cannot change), leaves transaction handling to SQLAlchemy
+and opens each transaction with `BEGIN IMMEDIATE`, so the write lock is taken upfront instead of failing halfway
+through with `SQLITE_BUSY`.
+- The session factories will create sessions that do not auto flush or expire objects on commit, giving more control
+over transactions and allowing loaded attributes to be read after a commit without another query.
 - The `Base` class will be used to define ORM models, linking them to the database.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import os
 
-DATABASE_URL = "sqlite:///./data.db"
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = "sqlite+aiosqlite:///./data.db"
+DATABASE_URL_RO = "sqlite+aiosqlite:///file:./data.db?mode=ro&uri=true"
+
+# Connection-level pragmas applied to every new connection; journal_mode is persistent in the database file and
+# can only be changed by the writer
+SQLITE_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA temp_store=memory",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+def _execute_pragmas(dbapi_connection, pragmas):
+    """
+    Executes the given pragmas on a raw DBAPI connection (the aiosqlite adapter has no `executescript`).
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# Async SQLAlchemy engine for read-only database connections
+engine_ro = create_async_engine(
+    DATABASE_URL_RO,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=os.cpu_count() or 1,
+    max_overflow=0,
+)
+
+# Async SQLAlchemy engine for the single writer connection
+engine_rw = create_async_engine(
+    DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=1,
+    max_overflow=0,
+)
+
+
+@event.listens_for(engine_ro.sync_engine, "connect")
+def _configure_ro_connection(dbapi_connection, connection_record):
+    """
+    Applies `SQLITE_PRAGMAS` to a new read-only connection.
+    """
+    _execute_pragmas(dbapi_connection, SQLITE_PRAGMAS)
+
+
+@event.listens_for(engine_rw.sync_engine, "connect")
+def _configure_rw_connection(dbapi_connection, connection_record):
+    """
+    Switches a new read-write connection to WAL mode, applies `SQLITE_PRAGMAS` and disables
+    the driver's own transaction handling, so that `_begin_immediate` controls when transactions start.
+    """
+    dbapi_connection.isolation_level = None
+    _execute_pragmas(dbapi_connection, ("PRAGMA journal_mode=WAL",) + SQLITE_PRAGMAS)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
 
+@event.listens_for(engine_rw.sync_engine, "begin")
+def _begin_immediate(connection):
+    """
+    Starts every read-write transaction with `BEGIN IMMEDIATE`, acquiring the write lock upfront.
+    """
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
 
-# SQLAlchemy engine for database connection
-engine = create_engine(DATABASE_URL)
 
-# SessionLocal is a session factory used to create database sessions
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Session factories used to create read-only and read-write async database sessions
+SessionLocalRO = async_sessionmaker(engine_ro, autoflush=False, expire_on_commit=False)
+SessionLocalRW = async_sessionmaker(engine_rw, autoflush=False, expire_on_commit=False)
 
 # Base class for creating SQLAlchemy ORM models
 Base = declarative_base()
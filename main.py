@@ -2,29 +2,53 @@
 This module sets up the FastAPI application, includes routers, and creates the necessary database tables.
 
 It imports FastAPI and related components to define API endpoints, as well as imports the SQLAlchemy
-`Base` and `engine` to manage database connections and tables.
+`Base` and `engine_rw` to manage database connections and tables.
 
 Key functionalities:
 - Instantiates the FastAPI app.
 - Includes all routers from `router_list` into the application.
-- Creates the SQLAlchemy database tables based on models defined in `Base`.
+- Creates the SQLAlchemy database tables based on models defined in `Base` on startup, but only when the
+`RUN_MIGRATIONS` environment variable is set to "1". Run the app once with it set at deploy time and start the
+workers without it, so they skip the table reflection queries.
 """
 
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, Response
 
-from database import Base, engine
+from database import Base, engine_ro, engine_rw
 from routers import router_list
+from utilities import shutdown_hash_executor, start_hash_executor
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lifespan handler of the FastAPI application.
 
-app = FastAPI()
+    Creates all the tables in the database based on the SQLAlchemy models if `RUN_MIGRATIONS` is set to "1" and
+    starts the password hashing process pool. On shutdown, stops the pool and closes the pooled database connections.
+
+    Args:
+        app (FastAPI): The FastAPI application being started.
+    """
+    if os.environ.get("RUN_MIGRATIONS") == "1":
+        async with engine_rw.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    start_hash_executor()
+    yield
+    shutdown_hash_executor()
+    await engine_ro.dispose()
+    await engine_rw.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Include all routers from the router_list into the FastAPI application
 for router in router_list:
     app.include_router(router)
 
-# Create all the tables in the database based on the SQLAlchemy models
-Base.metadata.create_all(bind=engine)
-
 
 @app.get("/")
 async def read_root(request: Request) -> Response:
@@ -7,10 +7,13 @@ the database tables and define relationships between users and their posts.
 Key components:
 - `Users` model: Represents a user, with fields for `id`, `email`, and `hashed_password`.
 - `Posts` model: Represents a post, with fields for `post_id`, `text`, and a foreign key reference to the user (`user_id`).
+A composite index on (`user_id`, `post_id`) turns listing a user's posts into an index seek instead of a table scan.
 - A one-to-many relationship is established between `Users` and `Posts`, meaning a user can have multiple posts.
+Both sides use `lazy="raise"`, so accessing a relationship that was not eagerly loaded raises instead of silently
+issuing an extra query per object (the N+1 problem).
 """
 
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -33,7 +36,7 @@ class Users(Base):
     email = Column(String(), unique=True, nullable=False, index=True)
     hashed_password = Column(String(), nullable=False)
 
-    posts = relationship("Posts", back_populates="owner")
+    posts = relationship("Posts", back_populates="owner", lazy="raise")
 
 
 class Posts(Base):
@@ -49,8 +52,9 @@ class Posts(Base):
     This model corresponds to the `posts` table in the database.
     """
     __tablename__ = "posts"
+    __table_args__ = (Index("ix_posts_user_id_post_id", "user_id", "post_id"),)
     post_id = Column(Integer, primary_key=True)
     text = Column(String(), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
 
-    owner = relationship("Users", back_populates="posts")
+    owner = relationship("Users", back_populates="posts", lazy="raise")
@@ -11,12 +11,11 @@ The `add-post` route is mapped to the `/add-post/` URL path and supports POST re
 """
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud import create_post
-from models import Users
-from schemas import PostCreate
-from utilities import get_db, validate_user
+from schemas import AuthenticatedUser, PostCreate
+from utilities import get_write_db, validate_user
 
 router = APIRouter()
 
@@ -24,8 +23,8 @@ router = APIRouter()
 @router.post("/add-post/")
 async def add_post(
     post: PostCreate,
-    user: Users = Depends(validate_user),
-    db: Session = Depends(get_db),
+    user: AuthenticatedUser = Depends(validate_user),
+    db: AsyncSession = Depends(get_write_db),
 ):
     """
     Endpoint for creating a new post.
@@ -34,8 +33,8 @@ async def add_post(
 
     Args:
         post (PostCreate): The data for the new post, validated by the `PostCreate` Pydantic model.
-        user (Users): The authenticated user, provided by the `validate_user` dependency.
-        db (Session): The database session, provided by the `get_db` dependency.
+        user (AuthenticatedUser): The authenticated user, provided by the `validate_user` dependency.
+        db (AsyncSession): The database session, provided by the `get_write_db` dependency.
 
     Returns:
         dict: A dictionary containing the `post_id` of the newly created post.
@@ -48,5 +47,5 @@ async def add_post(
             "post_id": 123
         }
     """
-    post_id = create_post(db, post, user)
+    post_id = await create_post(db, post, user)
     return {"post_id": post_id}
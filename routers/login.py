@@ -4,7 +4,10 @@ This module defines the FastAPI router for user login functionality.
 Key components:
 - `log_in`: Endpoint for logging in a user by validating their email and password.
 - Uses `get_user_by_email` to retrieve the user from the database.
-- Uses the Argon2 password hashing library to verify the password.
+- Uses the Argon2 password hashing library to verify the password in the hashing process pool. Unknown emails
+are verified against `DUMMY_HASH`, so both failure cases take the same time and return the same error.
+- Rehashes passwords stored with outdated Argon2 parameters after a successful login, so legacy hashes (e.g. the
+argon2-cffi defaults) converge to the current type, time cost, parallelism and memory floor.
 - Generates an access token upon successful authentication using `create_access_token`.
 
 The login route is mapped to the `/login` URL path and supports POST requests.
@@ -13,34 +16,50 @@ The login route is mapped to the `/login` URL path and supports POST requests.
 from argon2.exceptions import VerifyMismatchError
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from crud import get_user_by_email, ph
+from crud import (
+    DUMMY_HASH,
+    get_user_by_email,
+    hash_needs_upgrade,
+    ph,
+    update_user_password_hash,
+)
 from schemas import UserSchema
-from utilities import create_access_token, get_db
+from utilities import (
+    create_access_token,
+    get_read_db,
+    get_write_db,
+    run_in_hash_executor,
+)
 
 router = APIRouter()
 
 
 @router.post("/login")
-def log_in(user: UserSchema = Depends(), db: Session = Depends(get_db)):
+async def log_in(
+    user: UserSchema = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    write_db: AsyncSession = Depends(get_write_db),
+):
     """
     Endpoint for logging in a user by verifying their email and password.
 
     This function retrieves the user from the database based on the provided email, verifies the password,
-    and generates an access token if the credentials are correct.
+    and generates an access token if the credentials are correct. If the stored hash was created with outdated
+    Argon2 parameters (see `hash_needs_upgrade`), it is replaced with a hash using the current ones.
 
     Args:
         user (UserSchema): The user's credentials, validated by the `UserSchema` Pydantic model.
-        db (Session): The database session, provided by the `get_db` dependency.
+        db (AsyncSession): The database session, provided by the `get_read_db` dependency.
+        write_db (AsyncSession): The database session used for rehashing, provided by the `get_write_db` dependency.
 
     Returns:
         dict: A dictionary containing the generated access token and the token type.
 
     Raises:
-        HTTPException:
-            - If the user with the provided email does not exist, a 404 error is raised.
-            - If the provided password doesn't match the stored hashed password, a 404 error is raised.
+        HTTPException: If the user with the provided email does not exist or the provided password doesn't match
+            the stored hashed password, a 404 error is raised.
 
     Example Response:
         {
@@ -48,18 +67,22 @@ def log_in(user: UserSchema = Depends(), db: Session = Depends(get_db)):
             "token_type": "bearer"
         }
     """
-    user_from_db = get_user_by_email(db, user.email)
-    if not user_from_db:
-        raise HTTPException(
-            status_code=404, detail="User with given email doesn't exists."
-        )
+    user_from_db = await get_user_by_email(db, user.email)
+    # Return the read connection to the pool before waiting for the hash executor
+    await db.close()
+    stored_hash = user_from_db.hashed_password if user_from_db else DUMMY_HASH
 
     try:
-        ph.verify(user_from_db.hashed_password, user.hashed_password)
+        await run_in_hash_executor(ph.verify, stored_hash, user.hashed_password)
+        # A password matching DUMMY_HASH must not log in a missing user
+        if not user_from_db:
+            raise VerifyMismatchError
     except VerifyMismatchError:
-        raise HTTPException(
-            status_code=404, detail="Given password doesn't match the email"
-        )
+        raise HTTPException(status_code=404, detail="Invalid email or password.")
+
+    if hash_needs_upgrade(stored_hash):
+        new_hash = await run_in_hash_executor(ph.hash, user.hashed_password)
+        await update_user_password_hash(write_db, user.email, new_hash)
 
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
@@ -3,7 +3,7 @@ This module defines the FastAPI router for user signup functionality.
 
 Key components:
 - `signup_create_user`: Endpoint for creating a new user account by validating email and password.
-- Uses `create_user` to add the user to the database.
+- Hashes the password in the hashing process pool and uses `create_user` to add the user to the database.
 - Handles `IntegrityError` if the user already exists.
 - Generates an access token upon successful signup using `create_access_token`.
 
@@ -13,18 +13,18 @@ The signup route is mapped to the `/signup` URL path and supports POST requests.
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from crud import create_user
+from crud import create_user, ph
 from schemas import UserSchema
-from utilities import create_access_token, get_db
+from utilities import create_access_token, get_write_db, run_in_hash_executor
 
 router = APIRouter()
 
 
 @router.post("/signup")
-def signup_create_user(
-    user: UserSchema = Depends(), db: Session = Depends(get_db)
+async def signup_create_user(
+    user: UserSchema = Depends(), db: AsyncSession = Depends(get_write_db)
 ) -> dict:
     """
     Endpoint for creating a new user account.
@@ -34,7 +34,7 @@ def signup_create_user(
 
     Args:
         user (UserSchema): The user's email and password, validated by the `UserSchema` Pydantic model.
-        db (Session): The database session, provided by the `get_db` dependency.
+        db (AsyncSession): The database session, provided by the `get_write_db` dependency.
 
     Returns:
         dict: A dictionary containing the generated access token and the token type.
@@ -50,12 +50,12 @@ def signup_create_user(
             "token_type": "bearer"
         }
     """
-    new_user = UserSchema(email=user.email, hashed_password=user.hashed_password)
+    hashed_password = await run_in_hash_executor(ph.hash, user.hashed_password)
     try:
-        create_user(db, new_user)
+        await create_user(db, user, hashed_password)
     except IntegrityError:
         raise HTTPException(
             status_code=403, detail="User with given email already exists."
         )
-    access_token = create_access_token(data={"sub": new_user.email})
+    access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
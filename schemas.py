@@ -4,11 +4,12 @@ This module defines Pydantic models used for request validation and data seriali
 Key components:
 - `UserSchema`: Pydantic model for validating and serializing user-related data, such as email and hashed password.
 - `PostCreate`: Pydantic model for validating and serializing post creation data, specifically the content of the post (text).
+- `AuthenticatedUser`: Lightweight named tuple describing the user authenticated by a JWT token.
 
 Pydantic models are used by FastAPI to validate incoming request bodies and automatically generate API documentation.
 """
 
-from typing import Annotated
+from typing import Annotated, NamedTuple
 
 from fastapi import Query
 from pydantic import BaseModel, EmailStr, Field
@@ -38,3 +39,18 @@ class PostCreate(BaseModel):
     This model is used for receiving post creation data in API endpoints and ensures the post's text adheres to length constraints.
     """
     text: str = Field(..., max_length=1_000_000)
+
+
+class AuthenticatedUser(NamedTuple):
+    """
+    Lightweight representation of the user authenticated by a JWT token.
+
+    Attributes:
+        id (int): The unique identifier of the user.
+        email (str): The email address of the user.
+
+    This is returned by token validation instead of the `Users` ORM object, so it can be cached without holding
+    a detached database row.
+    """
+    id: int
+    email: str
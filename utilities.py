@@ -4,44 +4,78 @@ for user authentication in the FastAPI application.
 
 It contains utility functions for:
 - Creating an access token with an expiration time.
-- Verifying the validity of the token and decoding it.
+- Verifying the validity of the token and decoding it, caching the result for the token's lifetime.
 - Validating the user's identity based on the token.
+- Running CPU-heavy password hashing off the event loop.
 
 Key Functions:
-- `get_db`: A dependency that provides a database session.
+- `get_read_db`: A dependency that provides a read-only database session.
+- `get_write_db`: A dependency that provides a read-write database session.
 - `create_access_token`: Creates a new JWT token for a user with an expiration time.
 - `verify_token`: Verifies and decodes a given JWT token, retrieving the user associated with the token.
 - `validate_user`: Validates the user's identity by verifying the token and ensuring the user is authorized.
+- `start_hash_executor` / `shutdown_hash_executor`: Create and shut down `HASH_EXECUTOR`, called from the app's lifespan.
+- `run_in_hash_executor`: Runs an Argon2 hash/verify call in `HASH_EXECUTOR` without blocking the event loop.
 """
 
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+import jwt
+from cachetools import TTLCache
 from fastapi import Depends
 from fastapi.exceptions import HTTPException
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud import get_user_by_email
-from database import SessionLocal
+from database import SessionLocalRO, SessionLocalRW
+from schemas import AuthenticatedUser
 
 SECRET_KEY = "secretkey"
 ALGORITHM = "HS256"
+# The HMAC key is encoded once here instead of on every encode/decode call
+SECRET_KEY_BYTES = SECRET_KEY.encode("utf-8")
 
+# Argon2 runs in separate processes, so a burst of logins doesn't block the event loop. Each application process
+# (e.g. each Uvicorn worker) has its own pool, so hashing memory is bounded by
+# `app processes * cpu_count * memory_cost`. Created by `start_hash_executor` on startup.
+HASH_EXECUTOR = None
 
-def get_db():
+# Verified tokens, keyed by a BLAKE2b digest of the token so the tokens themselves are not kept in memory
+token_cache = TTLCache(maxsize=10000, ttl=60)
+token_cache_lock = threading.Lock()
+
+
+async def get_read_db():
     """
-    Dependency function that provides a database session.
+    Dependency function that provides a read-only database session.
 
-    This function can be used in FastAPI route handlers to obtain a database session.
+    This function can be used in FastAPI route handlers that only query the database.
 
     Yields:
-        Session: A SQLAlchemy database session object.
+        AsyncSession: A SQLAlchemy async database session object bound to the read-only engine.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocalRO() as db:
+        yield db
+
+
+async def get_write_db():
+    """
+    Dependency function that provides a read-write database session.
+
+    This function can be used in FastAPI route handlers that modify the database.
+
+    Yields:
+        AsyncSession: A SQLAlchemy async database session object bound to the read-write engine.
+    """
+    async with SessionLocalRW() as db:
         yield db
-    finally:
-        db.close()
 
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=15)):
@@ -61,50 +95,114 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes
     to_encode = data.copy()
     expire = datetime.now() + expires_delta
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, SECRET_KEY_BYTES, algorithm=ALGORITHM)
 
 
-def verify_token(token: str, db: Session = Depends(get_db)):
+async def verify_token(token: str, db: AsyncSession = Depends(get_read_db)):
     """
     Verifies and decodes the JWT token, returning the associated user if the token is valid.
 
     Args:
         token (str): The JWT token to verify and decode.
-        db (Session): The database session, provided via dependency injection.
+        db (AsyncSession): The database session, provided via dependency injection.
 
     Returns:
-        user (User or None): The user object if the token is valid, otherwise None.
+        user (AuthenticatedUser or None): The authenticated user if the token is valid, otherwise None.
 
     This function decodes the JWT token, checks if the 'sub' field (user email) exists, and verifies the
     validity of the token. If valid, it retrieves the user from the database using the decoded email.
+    The result is cached in `token_cache` until the token expires (at most for the cache's TTL), so
+    repeated requests with the same token skip both the decoding and the database query.
     """
+    token_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    with token_cache_lock:
+        cached = token_cache.get(token_key)
+    if cached:
+        user, expires_at = cached
+        if expires_at > time.time():
+            return user
+        with token_cache_lock:
+            token_cache.pop(token_key, None)
+
     try:
-        payload = jwt.decode(token.encode("utf-8"), SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY_BYTES, algorithms=[ALGORITHM])
         user_email = payload.get("sub")
         if not user_email:
             return None
-    except JWTError:
+    except jwt.InvalidTokenError:
         return None
 
-    if user := get_user_by_email(db, user_email):
+    user_from_db = await get_user_by_email(db, user_email)
+    # Return the read connection to the pool right away; otherwise it stays checked out for the rest of the request
+    await db.close()
+    if user_from_db:
+        user = AuthenticatedUser(id=user_from_db.id, email=user_from_db.email)
+        with token_cache_lock:
+            token_cache[token_key] = (user, payload["exp"])
         return user
 
 
-def validate_user(token: str, db: Session = Depends(get_db)):
+async def validate_user(token: str, db: AsyncSession = Depends(get_read_db)):
     """
     Validates the user based on the provided JWT token. If the token is invalid, raises an HTTPException.
 
     Args:
         token (str): The JWT token to validate.
-        db (Session): The database session, provided via dependency injection.
+        db (AsyncSession): The database session, provided via dependency injection.
 
     Returns:
-        user (User): The validated user object.
+        user (AuthenticatedUser): The validated user.
 
     Raises:
         HTTPException: If the token is invalid or user cannot be found, raises a 401 Unauthorized error.
     """
-    user = verify_token(token, db)
+    user = await verify_token(token, db)
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized access.")
     return user
+
+
+def start_hash_executor() -> None:
+    """
+    Creates `HASH_EXECUTOR` with one worker process per CPU core.
+
+    The workers are started through a forkserver rather than forked from the application process, which by then runs
+    the aiosqlite connection threads; forking a multi-threaded process can deadlock the child.
+    """
+    global HASH_EXECUTOR
+    HASH_EXECUTOR = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("forkserver")
+    )
+
+
+def shutdown_hash_executor() -> None:
+    """
+    Shuts down `HASH_EXECUTOR`, waiting for running hash jobs to finish.
+    """
+    global HASH_EXECUTOR
+    if HASH_EXECUTOR is not None:
+        HASH_EXECUTOR.shutdown()
+        HASH_EXECUTOR = None
+
+
+async def run_in_hash_executor(func, *args):
+    """
+    Runs a password hashing function in `HASH_EXECUTOR` and awaits its result.
+
+    Args:
+        func (callable): The function to run, typically `ph.hash` or `ph.verify`.
+        *args: Positional arguments passed to `func`.
+
+    Returns:
+        Any: The value returned by `func`.
+
+    Raises:
+        RuntimeError: If `HASH_EXECUTOR` has not been started with `start_hash_executor`.
+
+    Exceptions raised by `func` (e.g. `VerifyMismatchError`) are propagated to the caller.
+    """
+    if HASH_EXECUTOR is None:
+        raise RuntimeError(
+            "HASH_EXECUTOR is not running; call start_hash_executor first."
+        )
+    return await asyncio.get_running_loop().run_in_executor(HASH_EXECUTOR, func, *args)